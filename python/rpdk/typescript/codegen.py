@@ -1,10 +1,17 @@
+import functools
+import json
 import logging
+import os
 import shutil
+import string
 import sys
-from subprocess import PIPE, CalledProcessError, run as subprocess_run  # nosec
+import time
+from concurrent.futures import ThreadPoolExecutor
+from subprocess import DEVNULL, PIPE, CalledProcessError, run as subprocess_run  # nosec
 from tempfile import TemporaryFile
 
-from rpdk.core.data_loaders import resource_stream
+from jinja2 import FileSystemBytecodeCache
+
 from rpdk.core.exceptions import DownstreamError
 from rpdk.core.init import input_with_validation
 from rpdk.core.jsonutils.resolver import ContainerType, resolve_models
@@ -14,9 +21,14 @@ from .resolver import contains_model, get_inner_type, translate_type
 from .utils import safe_reserved
 
 if sys.version_info >= (3, 8):  # pragma: no cover
-    from zipfile import ZipFile
+    from zipfile import ZIP_DEFLATED, ZipFile, ZipInfo
+else:  # pragma: no cover
+    from zipfile38 import ZIP_DEFLATED, ZipFile, ZipInfo
+
+if sys.version_info >= (3, 9):  # pragma: no cover
+    from importlib.resources import files as resource_files
 else:  # pragma: no cover
-    from zipfile38 import ZipFile
+    from importlib_resources import files as resource_files
 
 
 LOG = logging.getLogger(__name__)
@@ -27,12 +39,91 @@ SUPPORT_LIB_NAME = (
 )
 SUPPORT_LIB_VERSION = "^1.0.1"
 MAIN_HANDLER_FUNCTION = "TypeFunction"
+COPY_BUFSIZE = 1024 * 1024
+# number of files read ahead of the zip writer, bounds memory use
+READ_BATCH_SIZE = 64
+# files above this size are streamed into the zip rather than read up front
+LARGE_FILE_SIZE = 256 * 1024
+# never needed at runtime, so not walked or packaged
+EXCLUDED_DIRS = frozenset((".git", "__pycache__", ".cache"))
+EXCLUDED_FILES = frozenset((".DS_Store",))
+EXCLUDED_SUFFIXES = (".log",)
 
 
 def validate_no(value):
     return value.lower() not in ("n", "no")
 
 
+@functools.lru_cache(maxsize=None)
+def _load_resource(name):
+    path = resource_files(__package__) / "data" / name
+    return path.read_text(encoding="utf-8")
+
+
+@functools.lru_cache(maxsize=4)
+def _resolve_models_cached(schema_json, base_model_name):
+    return resolve_models(json.loads(schema_json), base_model_name)
+
+
+def _resolve_models(schema, base_model_name="ResourceModel"):
+    # keyed on content rather than the schema file's mtime, since the
+    # in-memory schema is what gets resolved; key order is kept as it
+    # determines the order of the generated models
+    models = _resolve_models_cached(json.dumps(schema), base_model_name)
+    return dict(models)
+
+
+def _walk_files(src_path):
+    # like os.walk, symlinked directories are not descended into
+    with os.scandir(src_path) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name not in EXCLUDED_DIRS:
+                    yield from _walk_files(entry.path)
+            elif entry.is_file() and not (
+                entry.name in EXCLUDED_FILES or entry.name.endswith(EXCLUDED_SUFFIXES)
+            ):
+                yield entry
+
+
+def _zip_info(arcname, st):
+    # same as ZipInfo.from_file with strict_timestamps=False, but reusing the
+    # stat result from the directory scan instead of stat'ing again
+    date_time = time.localtime(st.st_mtime)[:6]
+    if date_time[0] < 1980:
+        date_time = (1980, 1, 1, 0, 0, 0)
+    elif date_time[0] > 2107:
+        date_time = (2107, 12, 31, 23, 59, 59)
+    zinfo = ZipInfo(arcname, date_time)
+    zinfo.external_attr = (st.st_mode & 0xFFFF) << 16
+    zinfo.file_size = st.st_size
+    return zinfo
+
+
+def _read_member(entry, arcname):
+    zinfo = _zip_info(arcname, entry.stat())
+    if zinfo.file_size > LARGE_FILE_SIZE:
+        # streamed by _write_member instead of being held in memory
+        return zinfo, None
+    with open(entry.path, "rb") as f:
+        return zinfo, f.read()
+
+
+def _write_member(zip_file, path, zinfo, data):
+    if data is not None:
+        zip_file.writestr(
+            zinfo,
+            data,
+            compress_type=zip_file.compression,
+            compresslevel=zip_file.compresslevel,
+        )
+        return
+    zinfo.compress_type = zip_file.compression
+    zinfo._compresslevel = zip_file.compresslevel  # pylint: disable=protected-access
+    with open(path, "rb") as src, zip_file.open(zinfo, "w") as dest:
+        shutil.copyfileobj(src, dest, COPY_BUFSIZE)
+
+
 class TypescriptLanguagePlugin(LanguagePlugin):
     MODULE_NAME = __name__
     NAME = "typescript"
@@ -42,14 +133,22 @@ class TypescriptLanguagePlugin(LanguagePlugin):
     CODE_URI = "./"
 
     def __init__(self):
+        # templates ship with the package, so never check them for changes;
+        # none of them are HTML or XML, so there is nothing to escape
         self.env = self._setup_jinja_env(
-            trim_blocks=True, lstrip_blocks=True, keep_trailing_newline=True
+            trim_blocks=True,
+            lstrip_blocks=True,
+            keep_trailing_newline=True,
+            auto_reload=False,
+            autoescape=False,
         )
         self.env.filters["translate_type"] = translate_type
         self.env.filters["contains_model"] = contains_model
         self.env.filters["get_inner_type"] = get_inner_type
         self.env.filters["safe_reserved"] = safe_reserved
         self.env.globals["ContainerType"] = ContainerType
+        self.env.bytecode_cache = FileSystemBytecodeCache(pattern="cfn-ts-%s.cache")
+        self._templates = {}
         self.namespace = None
         self.package_name = None
         self.package_root = None
@@ -57,8 +156,13 @@ class TypescriptLanguagePlugin(LanguagePlugin):
         self._protocol_version = "2.0.0"
         self._build_command = None
         self._lib_path = None
+        self._project = None
 
     def _init_from_project(self, project):
+        # init, generate and package may all run against the same project
+        if project is self._project:
+            return
+        self._project = project
         self.namespace = tuple(s.lower() for s in project.type_info)
         self.package_name = "-".join(self.namespace)
         self._use_docker = project.settings.get("useDocker", True)
@@ -66,6 +170,11 @@ class TypescriptLanguagePlugin(LanguagePlugin):
         self._build_command = project.settings.get("buildCommand", None)
         self._lib_path = SUPPORT_LIB_VERSION
 
+    def _get_template(self, name):
+        if name not in self._templates:
+            self._templates[name] = self.env.get_template(name)
+        return self._templates[name]
+
     def _init_settings(self, project):
         LOG.debug("Writing settings")
         self._use_docker = input_with_validation(
@@ -89,16 +198,19 @@ class TypescriptLanguagePlugin(LanguagePlugin):
 
         def _render_template(path, **kwargs):
             LOG.debug("Writing '%s'", path)
-            template = self.env.get_template(path.name)
+            template = self._get_template(path.name)
             contents = template.render(**kwargs)
             project.safewrite(path, contents)
 
+        def _substitute_resource(path, **kwargs):
+            # fixed layout with a few placeholders, no need for Jinja
+            LOG.debug("Writing '%s'", path)
+            template = string.Template(_load_resource(path.name))
+            project.safewrite(path, template.substitute(**kwargs))
+
         def _copy_resource(path, resource_name=None):
             LOG.debug("Writing '%s'", path)
-            if not resource_name:
-                resource_name = path.name
-            contents = resource_stream(__name__, f"data/{resource_name}").read()
-            project.safewrite(path, contents)
+            project.safewrite(path, _load_resource(resource_name or path.name))
 
         # handler Typescript package
         handler_package_path = self.package_root
@@ -118,7 +230,7 @@ class TypescriptLanguagePlugin(LanguagePlugin):
         sam_tests_folder.mkdir(exist_ok=True)
         _copy_resource(sam_tests_folder / "create.json")
         _copy_resource(project.root / "tsconfig.json")
-        _render_template(
+        _substitute_resource(
             project.root / "package.json",
             name=project.hypenated_name,
             description=f"AWS custom resource provider named {project.type_name}.",
@@ -157,10 +269,10 @@ class TypescriptLanguagePlugin(LanguagePlugin):
 
         self._init_from_project(project)
 
-        models = resolve_models(project.schema)
+        models = _resolve_models(project.schema)
 
         if project.configuration_schema:
-            configuration_models = resolve_models(
+            configuration_models = _resolve_models(
                 project.configuration_schema, "TypeConfigurationModel"
             )
         else:
@@ -170,7 +282,7 @@ class TypescriptLanguagePlugin(LanguagePlugin):
 
         path = self.package_root / "models.ts"
         LOG.debug("Writing file: %s", path)
-        template = self.env.get_template("models.ts")
+        template = self._get_template("models.ts")
 
         contents = template.render(
             lib_name=SUPPORT_LIB_NAME,
@@ -187,10 +299,17 @@ class TypescriptLanguagePlugin(LanguagePlugin):
     def _pre_package(self, build_path):
         # Caller should own/delete this, not us.
         # pylint: disable=consider-using-with
-        f = TemporaryFile("w+b")
+        f = TemporaryFile("w+b", buffering=COPY_BUFSIZE)
 
         # pylint: disable=unexpected-keyword-arg
-        with ZipFile(f, mode="w", strict_timestamps=False) as zip_file:
+        with ZipFile(
+            f,
+            mode="w",
+            compression=ZIP_DEFLATED,
+            compresslevel=1,
+            allowZip64=True,
+            strict_timestamps=False,
+        ) as zip_file:
             self._recursive_relative_write(build_path, build_path, zip_file)
         f.seek(0)
 
@@ -198,10 +317,19 @@ class TypescriptLanguagePlugin(LanguagePlugin):
 
     @staticmethod
     def _recursive_relative_write(src_path, base_path, zip_file):
-        for path in src_path.rglob("*"):
-            if path.is_file():
-                relative = path.relative_to(base_path)
-                zip_file.write(path.resolve(), str(relative))
+        # src_path is always inside base_path, so slicing off the prefix
+        # is enough to get the archive name once both are absolute
+        prefix_len = len(os.path.join(os.path.abspath(base_path), ""))
+        entries = list(_walk_files(os.path.abspath(src_path)))
+        # reading is parallelised, but ZipFile only supports a single writer
+        with ThreadPoolExecutor() as executor:
+            for start in range(0, len(entries), READ_BATCH_SIZE):
+                end = start + READ_BATCH_SIZE
+                batch = entries[start:end]
+                arcnames = [entry.path[prefix_len:] for entry in batch]
+                members = executor.map(_read_member, batch, arcnames)
+                for entry, (zinfo, data) in zip(batch, members):
+                    _write_member(zip_file, entry.path, zinfo, data)
 
     def package(self, project, zip_file):
         LOG.debug("Package started")
@@ -214,8 +342,13 @@ class TypescriptLanguagePlugin(LanguagePlugin):
         self._remove_build_artifacts(build_path)
         self._build(project.root)
 
-        inner_zip = self._pre_package(build_path / MAIN_HANDLER_FUNCTION)
-        zip_file.writestr("ResourceProvider.zip", inner_zip.read())
+        # same metadata writestr would give the entry
+        zinfo = ZipInfo("ResourceProvider.zip", time.localtime()[:6])
+        zinfo.compress_type = zip_file.compression
+        zinfo.external_attr = 0o600 << 16
+        with self._pre_package(build_path / MAIN_HANDLER_FUNCTION) as inner_zip:
+            with zip_file.open(zinfo, "w", force_zip64=True) as dest:
+                shutil.copyfileobj(inner_zip, dest, COPY_BUFSIZE)
         self._recursive_relative_write(handler_package_path, project.root, zip_file)
 
         LOG.debug("Package complete")
@@ -229,13 +362,13 @@ class TypescriptLanguagePlugin(LanguagePlugin):
 
     @staticmethod
     def _make_build_command(base_path, build_command=None):
-        command = (
-            "npm install --optional "
-            + f"&& sam build --debug --build-dir {base_path}/build"
-        )
         if build_command is not None:
-            command = build_command
-        return command
+            return build_command
+        # run without a shell, one argument list per step
+        return [
+            ["npm", "install", "--optional"],
+            ["sam", "build", "--debug", "--build-dir", str(base_path / "build")],
+        ]
 
     def _build(self, base_path):
         LOG.debug("Dependencies build started from '%s'", base_path)
@@ -243,24 +376,33 @@ class TypescriptLanguagePlugin(LanguagePlugin):
         # TODO: We should use the build logic from SAM CLI library, instead:
         # https://github.com/awslabs/aws-sam-cli/blob/master/samcli/lib/build/app_builder.py
         command = self._make_build_command(base_path, self._build_command)
+        extra_args = [MAIN_HANDLER_FUNCTION]
         if self._use_docker:
-            command = command + " --use-container"
-        command = command + " " + MAIN_HANDLER_FUNCTION
+            extra_args.insert(0, "--use-container")
+        if isinstance(command, str):
+            # a user supplied buildCommand may use any shell syntax
+            steps = [["/bin/bash", "-c", " ".join([command, *extra_args])]]
+        else:
+            steps = command[:-1] + [command[-1] + extra_args]
+
+        LOG.debug("build steps are %s", steps)
 
-        LOG.debug("command is '%s'", command)
+        # build output is only ever logged at debug level
+        output = PIPE if LOG.isEnabledFor(logging.DEBUG) else DEVNULL
 
         LOG.warning("Starting build.")
         try:
-            completed_proc = subprocess_run(  # nosec
-                ["/bin/bash", "-c", command],
-                stdout=PIPE,
-                stderr=PIPE,
-                cwd=base_path,
-                check=True,
-            )
+            for args in steps:
+                completed_proc = subprocess_run(  # nosec
+                    args,
+                    stdout=output,
+                    stderr=output,
+                    cwd=base_path,
+                    check=True,
+                )
+                LOG.debug("--- build stdout:\n%s", completed_proc.stdout)
+                LOG.debug("--- build stderr:\n%s", completed_proc.stderr)
         except (FileNotFoundError, CalledProcessError) as e:
             raise DownstreamError("local build failed") from e
 
-        LOG.debug("--- build stdout:\n%s", completed_proc.stdout)
-        LOG.debug("--- build stderr:\n%s", completed_proc.stderr)
         LOG.debug("Dependencies build finished")
@@ -40,6 +40,7 @@ setup(
     install_requires=[
         "cloudformation-cli>=0.1.14",
         "zipfile38>=0.0.3,<0.2",
+        'importlib_resources>=1.3;python_version<"3.9"',
     ],
     entry_points={
         "rpdk.v1.languages": [
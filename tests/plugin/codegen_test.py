@@ -1,23 +1,30 @@
 # pylint: disable=redefined-outer-name,protected-access
+import json
+import logging
 import os
 import sys
-from subprocess import CalledProcessError
-from unittest.mock import patch, sentinel
+from datetime import datetime, timedelta
+from pathlib import Path
+from subprocess import DEVNULL, CalledProcessError
+from unittest.mock import call, patch, sentinel
 from uuid import uuid4
 
 import pytest
 from rpdk.core.exceptions import DownstreamError
 from rpdk.core.project import Project
 from rpdk.typescript.codegen import (
+    LARGE_FILE_SIZE,
     SUPPORT_LIB_NAME,
     TypescriptLanguagePlugin,
+    _load_resource,
+    resource_files,
     validate_no,
 )
 
 if sys.version_info >= (3, 8):  # pragma: no cover
-    from zipfile import ZipFile
+    from zipfile import ZIP_DEFLATED, ZipFile
 else:  # pragma: no cover
-    from zipfile38 import ZipFile
+    from zipfile38 import ZIP_DEFLATED, ZipFile
 
 
 TYPE_NAME = "foo::bar::baz"
@@ -76,12 +83,41 @@ def test_validate_no(value: str, result: bool):
     assert validate_no(value) is result
 
 
+def test__load_resource_cached():
+    _load_resource.cache_clear()
+    with patch(
+        "rpdk.typescript.codegen.resource_files",
+        wraps=resource_files,
+    ) as mock_files:
+        first = _load_resource("typescript.gitignore")
+        second = _load_resource("typescript.gitignore")
+
+    assert first is second
+    assert "node_modules" in first
+    mock_files.assert_called_once_with("rpdk.typescript")
+
+
 def test__remove_build_artifacts_file_found(tmp_path: str):
     deps_path = tmp_path / "build"
     deps_path.mkdir()
     TypescriptLanguagePlugin._remove_build_artifacts(deps_path)
 
 
+def test__remove_build_artifacts_nested(tmp_path: str):
+    target_path = tmp_path / "target"
+    target_path.mkdir()
+    (target_path / "index.js").write_text("index")
+    deps_path = tmp_path / "build"
+    (deps_path / "TypeFunction" / "node_modules").mkdir(parents=True)
+    (deps_path / "TypeFunction" / "handlers.js").write_text("handlers")
+    (deps_path / "TypeFunction" / "node_modules" / "linked").symlink_to(target_path)
+
+    TypescriptLanguagePlugin._remove_build_artifacts(deps_path)
+
+    assert not deps_path.exists()
+    assert (target_path / "index.js").exists()
+
+
 def test__remove_build_artifacts_file_not_found(tmp_path: str):
     deps_path = tmp_path / "build"
     with patch("rpdk.typescript.codegen.LOG", autospec=True) as mock_log:
@@ -90,6 +126,35 @@ def test__remove_build_artifacts_file_not_found(tmp_path: str):
     mock_log.debug.assert_called_once()
 
 
+def test_jinja_env(plugin: TypescriptLanguagePlugin):
+    assert plugin.env.auto_reload is False
+    assert plugin.env.autoescape is False
+
+
+def test__get_template_cached(plugin: TypescriptLanguagePlugin):
+    with patch.object(
+        plugin.env, "get_template", wraps=plugin.env.get_template
+    ) as mock_get_template:
+        first = plugin._get_template("models.ts")
+        second = plugin._get_template("models.ts")
+
+    assert first is second
+    mock_get_template.assert_called_once_with("models.ts")
+
+
+def test__init_from_project_once(plugin: TypescriptLanguagePlugin, tmp_path: str):
+    project = Project(root=tmp_path)
+    project.type_info = ("Foo", "Bar", "Baz")
+    project.settings = {}
+
+    plugin._init_from_project(project)
+    project.type_info = ("Qux", "Bar", "Baz")
+    plugin._init_from_project(project)
+
+    assert plugin.namespace == ("foo", "bar", "baz")
+    assert plugin.package_name == "foo-bar-baz"
+
+
 def test_initialize(project: Project):
     lib_path = project._plugin._lib_path
     assert project.settings == {"useDocker": False, "protocolVersion": "2.0.0"}
@@ -116,6 +181,7 @@ def test_initialize(project: Project):
 
     assert "node_modules" in files[".gitignore"].read_text()
     package_json = files["package.json"].read_text()
+    assert json.loads(package_json)["name"] == "foo-bar-baz"
     assert SUPPORT_LIB_NAME in package_json
     assert lib_path in package_json
 
@@ -138,6 +204,18 @@ def test_generate(project: Project):
     assert files == {"src/models.ts"}
 
 
+def test_generate_models_cached(project: Project):
+    project.load_schema()
+    project.generate()
+    models = (project.root / "src" / "models.ts").read_text()
+
+    with patch("rpdk.typescript.codegen.resolve_models", autospec=True) as mock_resolve:
+        project.generate()
+
+    mock_resolve.assert_not_called()
+    assert (project.root / "src" / "models.ts").read_text() == models
+
+
 def test_package_local(project: Project):
     project.load_schema()
     project.generate()
@@ -160,6 +238,106 @@ def test_package_local(project: Project):
         ]
 
 
+def test_package_inner_zip(project: Project):
+    project.load_schema()
+    project.generate()
+
+    def _build(base_path):
+        function_path = base_path / "build" / "TypeFunction" / "dist"
+        function_path.mkdir(parents=True)
+        (function_path / "handlers.js").write_text("handlers")
+
+    zip_path = project.root / "foo-bar-baz.zip"
+
+    patch_build = patch.object(project._plugin, "_build", side_effect=_build)
+    started = datetime.now()
+    # pylint: disable=unexpected-keyword-arg
+    with patch_build, zip_path.open("wb") as f, ZipFile(
+        f, mode="w", strict_timestamps=False
+    ) as zip_file:
+        project._plugin.package(project, zip_file)
+
+    with zip_path.open("rb") as f, ZipFile(
+        f, mode="r", strict_timestamps=False
+    ) as zip_file:
+        assert sorted(zip_file.namelist()) == [
+            "ResourceProvider.zip",
+            "src/handlers.ts",
+            "src/models.ts",
+        ]
+        info = zip_file.getinfo("ResourceProvider.zip")
+        # zip timestamps have a two second resolution
+        packaged_at = datetime(*info.date_time)
+        assert started - timedelta(seconds=2) <= packaged_at <= datetime.now()
+        with zip_file.open("ResourceProvider.zip") as inner_f, ZipFile(
+            inner_f, mode="r", strict_timestamps=False
+        ) as inner_zip:
+            assert inner_zip.namelist() == ["dist/handlers.js"]
+            info = inner_zip.getinfo("dist/handlers.js")
+            assert info.compress_type == ZIP_DEFLATED
+            assert inner_zip.read("dist/handlers.js") == b"handlers"
+
+
+def test__recursive_relative_write(tmp_path: str):
+    src_path = tmp_path / "src"
+    (src_path / "nested").mkdir(parents=True)
+    (src_path / "handlers.ts").write_text("handlers")
+    (src_path / "nested" / "models.ts").write_text("models")
+    (src_path / "broken.js").symlink_to(src_path / "missing.js")
+    (src_path / "nested" / "models.ts").chmod(0o755)
+    (src_path / ".cache").mkdir()
+    (src_path / ".cache" / "cached.js").write_text("cached")
+    (src_path / "npm-debug.log").write_text("log")
+    (src_path / ".DS_Store").write_text("")
+    os.utime(src_path / "handlers.ts", (0, 0))
+    large = os.urandom(LARGE_FILE_SIZE) * 2
+    (src_path / "bundle.js").write_bytes(large)
+
+    zip_path = tmp_path / "test.zip"
+    # pylint: disable=unexpected-keyword-arg
+    with zip_path.open("wb") as f, ZipFile(
+        f, mode="w", strict_timestamps=False
+    ) as zip_file:
+        TypescriptLanguagePlugin._recursive_relative_write(src_path, tmp_path, zip_file)
+
+    with zip_path.open("rb") as f, ZipFile(
+        f, mode="r", strict_timestamps=False
+    ) as zip_file:
+        assert sorted(zip_file.namelist()) == [
+            "src/bundle.js",
+            "src/handlers.ts",
+            "src/nested/models.ts",
+        ]
+        assert zip_file.read("src/nested/models.ts") == b"models"
+        assert zip_file.read("src/bundle.js") == large
+        info = zip_file.getinfo("src/nested/models.ts")
+        assert (info.external_attr >> 16) & 0o777 == 0o755
+        assert info.file_size == len("models")
+        info = zip_file.getinfo("src/handlers.ts")
+        assert info.date_time == (1980, 1, 1, 0, 0, 0)
+
+
+def test__recursive_relative_write_relative_base(tmp_path: str, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    src_path = Path("src")
+    (src_path / "nested").mkdir(parents=True)
+    (src_path / "nested" / "models.ts").write_text("models")
+
+    zip_path = tmp_path / "test.zip"
+    # pylint: disable=unexpected-keyword-arg
+    with zip_path.open("wb") as f, ZipFile(
+        f, mode="w", strict_timestamps=False
+    ) as zip_file:
+        TypescriptLanguagePlugin._recursive_relative_write(
+            src_path, Path("."), zip_file
+        )
+
+    with zip_path.open("rb") as f, ZipFile(
+        f, mode="r", strict_timestamps=False
+    ) as zip_file:
+        assert zip_file.namelist() == ["src/nested/models.ts"]
+
+
 def test__build_called_process_error(plugin: TypescriptLanguagePlugin, tmp_path: str):
     executable_name = str(uuid4())
     plugin._build_command = executable_name
@@ -177,7 +355,8 @@ def test__build_called_process_error(plugin: TypescriptLanguagePlugin, tmp_path:
     assert isinstance(excinfo.value.__cause__, CalledProcessError)
 
 
-def test__build_docker(plugin: TypescriptLanguagePlugin):
+def test__build_docker(plugin: TypescriptLanguagePlugin, caplog):
+    caplog.set_level(logging.DEBUG, logger="rpdk.typescript.codegen")
     plugin._use_docker = True
 
     patch_cmd = patch.object(
@@ -197,3 +376,89 @@ def test__build_docker(plugin: TypescriptLanguagePlugin):
         stderr=-1,
         stdout=-1,
     )
+
+
+def test__build_default_command(plugin: TypescriptLanguagePlugin, caplog):
+    caplog.set_level(logging.DEBUG, logger="rpdk.typescript.codegen")
+    plugin._use_docker = True
+    base_path = Path("/home/o'brien/my project")
+
+    patch_subprocess_run = patch(
+        "rpdk.typescript.codegen.subprocess_run", autospec=True
+    )
+    with patch_subprocess_run as mock_subprocess_run:
+        plugin._build(base_path)
+
+    kwargs = {"check": True, "cwd": base_path, "stderr": -1, "stdout": -1}
+    assert mock_subprocess_run.call_args_list == [
+        call(["npm", "install", "--optional"], **kwargs),
+        call(
+            [
+                "sam",
+                "build",
+                "--debug",
+                "--build-dir",
+                "/home/o'brien/my project/build",
+                "--use-container",
+                "TypeFunction",
+            ],
+            **kwargs,
+        ),
+    ]
+
+
+def test__build_default_command_stops_on_failure(plugin: TypescriptLanguagePlugin):
+    patch_subprocess_run = patch(
+        "rpdk.typescript.codegen.subprocess_run",
+        autospec=True,
+        side_effect=CalledProcessError(1, "npm"),
+    )
+    with patch_subprocess_run as mock_subprocess_run:
+        with pytest.raises(DownstreamError):
+            plugin._build(Path("/proj"))
+
+    mock_subprocess_run.assert_called_once()
+
+
+def test__build_custom_command_uses_shell(plugin: TypescriptLanguagePlugin, caplog):
+    caplog.set_level(logging.DEBUG, logger="rpdk.typescript.codegen")
+    plugin._use_docker = False
+    plugin._build_command = "npm run build; sam build"
+
+    patch_subprocess_run = patch(
+        "rpdk.typescript.codegen.subprocess_run", autospec=True
+    )
+    with patch_subprocess_run as mock_subprocess_run:
+        plugin._build(sentinel.base_path)
+
+    mock_subprocess_run.assert_called_once_with(
+        ["/bin/bash", "-c", "npm run build; sam build TypeFunction"],
+        check=True,
+        cwd=sentinel.base_path,
+        stderr=-1,
+        stdout=-1,
+    )
+
+
+def test__build_output_discarded_without_debug(
+    plugin: TypescriptLanguagePlugin, caplog
+):
+    caplog.set_level(logging.INFO, logger="rpdk.typescript.codegen")
+    plugin._use_docker = False
+
+    patch_cmd = patch.object(
+        TypescriptLanguagePlugin, "_make_build_command", return_value="sam build"
+    )
+    patch_subprocess_run = patch(
+        "rpdk.typescript.codegen.subprocess_run", autospec=True
+    )
+    with patch_cmd, patch_subprocess_run as mock_subprocess_run:
+        plugin._build(sentinel.base_path)
+
+    mock_subprocess_run.assert_called_once_with(
+        ["/bin/bash", "-c", "sam build TypeFunction"],
+        check=True,
+        cwd=sentinel.base_path,
+        stderr=DEVNULL,
+        stdout=DEVNULL,
+    )